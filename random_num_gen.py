@@ -7,8 +7,26 @@ the probabilities given due to the law of large numbers.
 import bisect
 import collections
 import decimal
+import fractions
+import functools
+import itertools
+import math
 import random
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# The most numbers for which RandomGen searches for each number with generated
+# code rather than using the alias method.
+MAX_NUM_COUNT_FOR_SEARCH = 64
+# The largest lookup table RandomGen builds for numbers with probabilities that
+# are simple fractions, unless the table has one entry per number anyway.
+MAX_LOOKUP_TABLE_SIZE = 1024
+# How many compiled decision trees to keep, so that generators created again
+# with the same probabilities don't build and compile the same code again.
+COMPILED_TREE_CACHE_SIZE = 128
+# The attributes that replace RandomGen's sampling methods on an instance.
+SAMPLER_NAMES = ("next_num", "next_num_fast", "_nums_for_rolls")
+# How many sequences each RandomGen keeps for next_sequence.
+SEQUENCE_CACHE_SIZE = 16
 
 
 def find_cumulative_probability_index_of_float(
@@ -26,8 +44,221 @@ def find_cumulative_probability_index_of_float(
         The index corresponding to the cumulative probability float.
     """
     # Find the insertion point for random_float in cumulative_probabilities.
-    index = bisect.bisect(cumulative_probabilities, probability_float)
-    return index
+    # This must be to the right of any equal value, as a roll that lands
+    # exactly on a cumulative probability is the start of the next range.
+    return bisect.bisect_right(cumulative_probabilities, probability_float)
+
+
+def build_alias_table(
+    probabilities: List[decimal.Decimal],
+) -> Tuple[List[decimal.Decimal], List[int]]:
+    """
+    Build the tables for Vose's alias method, which allows a number to be
+    sampled in constant time regardless of how many numbers there are.
+
+    Args:
+        probabilities: Probability of each number, which must sum to 1.
+
+    Returns:
+        A tuple of the probability of keeping each index when it is rolled,
+        and the index to fall back to (its alias) when it is not kept.
+    """
+    num_count = len(probabilities)
+    # Scale the probabilities so that the average probability is 1, then
+    # split the indices into those below and above the average.
+    scaled_probabilities = [probability * num_count for probability in probabilities]
+    small = collections.deque()
+    large = collections.deque()
+    for index, probability in enumerate(scaled_probabilities):
+        if probability < 1:
+            small.append(index)
+        else:
+            large.append(index)
+
+    # Any index left unpaired at the end is always kept when it is rolled.
+    alias_probabilities = [decimal.Decimal(1)] * num_count
+    alias_indices = list(range(num_count))
+    while small and large:
+        small_index = small.popleft()
+        large_index = large.popleft()
+        # Top up the small index's column with probability from the large one.
+        alias_probabilities[small_index] = scaled_probabilities[small_index]
+        alias_indices[small_index] = large_index
+        scaled_probabilities[large_index] -= 1 - scaled_probabilities[small_index]
+        if scaled_probabilities[large_index] < 1:
+            small.append(large_index)
+        else:
+            large.append(large_index)
+
+    return alias_probabilities, alias_indices
+
+
+def build_lookup_table(
+    random_nums: List[int],
+    probabilities: List[decimal.Decimal],
+    max_size: int,
+) -> Optional[List[int]]:
+    """
+    Build the smallest table in which each number appears in proportion to its
+    probability, so that indexing it at a uniformly random position samples a
+    number with a single lookup.
+
+    Args:
+        random_nums: Numbers to fill the table with.
+        probabilities: Probability of each number, which must sum to 1.
+        max_size: Largest table to build.
+
+    Returns:
+        The table, or None if every probability cannot be represented exactly
+        by a table of at most max_size entries.
+    """
+    # The table size must be a multiple of the denominator of every
+    # probability, so the smallest size is their lowest common multiple.
+    size = 1
+    for probability in probabilities:
+        denominator = fractions.Fraction(probability).denominator
+        size = size * denominator // math.gcd(size, denominator)
+        if size > max_size:
+            return None
+
+    table = []
+    for random_num, probability in zip(random_nums, probabilities):
+        table.extend([random_num] * int(probability * size))
+    return table
+
+
+def build_decision_tree(ranges: List[Tuple[decimal.Decimal, float, int]]) -> str:
+    """
+    Generate a decision tree that finds which range a roll falls into, as a
+    Python expression of nested conditionals on a variable named roll that
+    indexes a sequence of numbers named nums. Each
+    comparison splits the remaining probability as evenly as possible, which
+    (like a Huffman code, but keeping the ranges in order) lets likely numbers
+    be reached in fewer comparisons.
+
+    Args:
+        ranges: Consecutive ranges in increasing order, each as a tuple of its
+            probability, its exclusive upper bound, and the index of its
+            number.
+
+    Returns:
+        Source code of an expression that evaluates to the number of the range
+        that roll falls into.
+    """
+    # The probability below each range, so that the probability of any run of
+    # ranges is the difference between two of these.
+    bounds = [
+        decimal.Decimal(0),
+        *itertools.accumulate(probability for probability, _, _ in ranges),
+    ]
+
+    def build_subtree(start: int, stop: int) -> str:
+        # The last range needs no upper bound, as every roll above the others
+        # falls into it. Numbers are looked up by index rather than written
+        # into the source, as the repr of an int subclass need not be valid
+        # code.
+        if stop - start == 1:
+            return f"nums[{ranges[start][2]}]"
+
+        # Find the split where the probability below it is closest to half,
+        # preferring the lower split when two are equally close.
+        middle = (bounds[start] + bounds[stop]) / 2
+        split = bisect.bisect_left(bounds, middle, start + 1, stop - 1)
+        if split > start + 1 and middle - bounds[split - 1] <= bounds[split] - middle:
+            split -= 1
+
+        threshold = ranges[split - 1][1]
+        return (
+            f"({build_subtree(start, split)} if roll < {threshold!r} "
+            f"else {build_subtree(split, stop)})"
+        )
+
+    return build_subtree(0, len(ranges))
+
+
+@functools.lru_cache(maxsize=COMPILED_TREE_CACHE_SIZE)
+def compile_sampling_functions(
+    probabilities: Tuple[float, ...],
+) -> Callable[
+    [Tuple[int, ...], Callable[[], float]],
+    Tuple[
+        Callable[[], int],
+        Callable[[float], int],
+        Callable[[Iterable[float]], List[int]],
+    ],
+]:
+    """
+    Compile versions of next_num, next_num_fast and _nums_for_rolls with the
+    cumulative probability ranges hard-coded as literals in a decision tree.
+    The compiled code only depends on the probabilities, so it is cached and
+    shared by every generator created with them.
+
+    Args:
+        probabilities: Probability of each number, which must sum to 1. These
+            are floats rather than Decimals as they are much cheaper to hash.
+
+    Returns:
+        A function that takes the numbers and a function returning random
+        floats, and returns a tuple of the next_num, next_num_fast and
+        _nums_for_rolls functions using them.
+    """
+    # Each float converts back to exactly the Decimal that RandomGen made
+    # from it, so the ranges are found with the same precision.
+    exact_probabilities = [
+        decimal.Decimal(str(probability)) for probability in probabilities
+    ]
+    ranges = []
+    for index, (probability, upper) in enumerate(
+        zip(exact_probabilities, itertools.accumulate(exact_probabilities))
+    ):
+        # A number with no probability has an empty range, so is never rolled.
+        if probability > 0:
+            ranges.append((probability, float(upper), index))
+    num_for_roll = build_decision_tree(ranges)
+
+    source = f"""
+def bind_sampling_functions(nums, random_float):
+    def next_num():
+        roll = random_float()
+        return {num_for_roll}
+
+    def next_num_fast(roll):
+        return {num_for_roll}
+
+    def nums_for_rolls(rolls):
+        return [{num_for_roll} for roll in rolls]
+
+    return next_num, next_num_fast, nums_for_rolls
+"""
+    namespace = {}
+    exec(source, namespace)
+    return namespace["bind_sampling_functions"]
+
+
+def build_sampling_functions(
+    random_nums: List[int],
+    probabilities: List[decimal.Decimal],
+    random_float: Callable[[], float],
+) -> Tuple[
+    Callable[[], int], Callable[[float], int], Callable[[Iterable[float]], List[int]]
+]:
+    """
+    Generate versions of next_num, next_num_fast and _nums_for_rolls
+    specialised to the given numbers and probabilities.
+
+    Args:
+        random_nums: Integer values that may be returned.
+        probabilities: Probability of each number, which must sum to 1.
+        random_float: Function that returns a random float between 0
+            inclusive and 1 exclusive.
+
+    Returns:
+        A tuple of the next_num, next_num_fast and _nums_for_rolls functions.
+    """
+    bind_sampling_functions = compile_sampling_functions(
+        tuple(map(float, probabilities))
+    )
+    return bind_sampling_functions(tuple(random_nums), random_float)
 
 
 class RandomNumberList:
@@ -35,13 +266,30 @@ class RandomNumberList:
     A list of random numbers that can be generated by RandomGen.
     """
 
+    def __set_name__(self, owner, name):
+        # Store the value on each instance, so that generators sharing this
+        # descriptor don't overwrite each other's numbers.
+        self.private_name = "_" + name
+
     def __set__(self, obj, value):
-        if not all(isinstance(num, int) for num in value):
+        # Run the type checks through map so that the loop stays in C.
+        if not all(map(isinstance, value, itertools.repeat(int))):
             raise TypeError("All random numbers must be integers.")
-        self.value = value
+        # Once the generator is set up, sampling reads its own tables rather
+        # than this list, so they are built again from the new numbers.
+        set_up = hasattr(obj, "_column_nums")
+        if set_up and len(value) != len(obj.probabilities):
+            raise ValueError("Length of random_nums and probabilities must be equal.")
+        setattr(obj, self.private_name, value)
+        if set_up:
+            obj._build_samplers()
 
     def __get__(self, obj, objtype=None):
-        return self.value
+        # Accessed on the class rather than an instance, so there is no value
+        # to return.
+        if obj is None:
+            return self
+        return getattr(obj, self.private_name)
 
 
 class RandomGen:
@@ -52,42 +300,161 @@ class RandomGen:
 
     random_nums = RandomNumberList()
 
-    def __init__(self, random_nums: List[int], probabilities: List[float]):
+    def __init__(
+        self,
+        random_nums: List[int],
+        probabilities: List[float],
+        seed: Optional[int] = None,
+    ):
         """
         Args:
             random_nums: Integer values that may be returned by the random
                 number generator. Example: [-1, 0, 1, 2, 3]
             probabilities: Probability of each number being returned by the
                 random number generator. Example: [0.01, 0.3, 0.58, 0.1, 0.01]
+            seed: Seed for a generator of this instance's own. If not given,
+                the random module's shared state is used, so random.seed
+                controls the numbers generated.
         """
         if len(random_nums) != len(probabilities):
             raise ValueError("Length of random_nums and probabilities must be equal.")
 
         self.random_nums = random_nums
 
-        # Calculate the cumulative probabilities to find the range that each
-        # number falls into when generating a random number.
+        # Validate and convert every probability in a single pass, checking the
+        # type first so that the range checks only ever compare floats.
         self.probabilities = []
-        self.cum_probabilities = []
-        cumulative = decimal.Decimal(0.00)
         for probability in probabilities:
+            if not isinstance(probability, float):
+                raise TypeError("Probabilities must be a list of floats.")
             if probability < 0:
                 raise ValueError("Probabilities must be non-negative.")
             if probability > 1.0:
                 raise ValueError("Probabilities cannot be greater than 1.0.")
-            if not isinstance(probability, float):
-                raise TypeError("Probabilities must be a list of floats.")
 
             # Convert probabilities into decimal floating point arithmetic for
             # precision to prevent floating point arithmetic errors.
-            probability = decimal.Decimal(str(probability))
-            cumulative += probability
-            self.probabilities.append(probability)
-            self.cum_probabilities.append(cumulative)
+            self.probabilities.append(decimal.Decimal(str(probability)))
 
-        if self.cum_probabilities[-1] != 1.0:
+        # Calculate the cumulative probabilities to find the range that each
+        # number falls into when generating a random number.
+        self.cum_probabilities = list(itertools.accumulate(self.probabilities))
+        # The total is the last cumulative probability, so no separate sum is
+        # needed. Comparing against an integer keeps the check exact.
+        if not self.cum_probabilities or self.cum_probabilities[-1] != 1:
             raise ValueError("Probabilities must sum to 1.")
 
+        # Cache what each draw needs so next_num avoids a global and module
+        # attribute lookup per call. Without a seed, the bound method still
+        # uses the random module's shared state, so random.seed continues to
+        # apply.
+        self._num_count = len(random_nums)
+        # The seeded generator is kept as well as its roll function, as it is
+        # what a pickle or deep copy of this instance needs to copy.
+        self._generator = None if seed is None else random.Random(seed)
+        self._random = random.random if seed is None else self._generator.random
+        self._float_cum_probabilities = list(map(float, self.cum_probabilities))
+        self._build_samplers()
+
+    def _build_samplers(self):
+        """
+        Build the tables that the numbers are sampled from, and bind the
+        fastest sampling methods for them. This runs again whenever
+        random_nums is changed, so that the new numbers are generated.
+        """
+        # The numbers are copied into a tuple so that changing the list passed
+        # in cannot change what is generated.
+        self._column_nums = tuple(self.random_nums)
+        # The sequences most recently returned by next_sequence, keyed by seed
+        # and count, from least to most recently used.
+        self._sequence_cache = collections.OrderedDict()
+
+        # How the numbers are sampled, which is one of "search", "lookup_table"
+        # or "alias".
+        self.sampling_method = "search"
+        if self._num_count > MAX_NUM_COUNT_FOR_SEARCH:
+            # Every probability being a simple fraction means a roll can be
+            # scaled straight to an entry of a small table without any alias
+            # check. When every number is equally likely, the table is just
+            # the numbers in order, so it is allowed to be as large as that.
+            lookup_table = build_lookup_table(
+                self._column_nums,
+                self.probabilities,
+                max(self._num_count, MAX_LOOKUP_TABLE_SIZE),
+            )
+            if lookup_table is not None:
+                self.sampling_method = "lookup_table"
+                self._lookup_table = tuple(lookup_table)
+                self._lookup_table_size = len(lookup_table)
+            else:
+                self.sampling_method = "alias"
+                # The alias table is built exactly in Decimal, but its
+                # thresholds are stored as floats as each roll is a float, and
+                # comparing against a Decimal is much slower.
+                alias_probabilities, alias_indices = build_alias_table(
+                    self.probabilities
+                )
+                self._alias_probabilities = [
+                    float(probability) for probability in alias_probabilities
+                ]
+                # Store the numbers each column returns rather than their
+                # indices, so a draw is a single lookup into a private tuple
+                # instead of going through an alias index and the random_nums
+                # descriptor.
+                self._alias_nums = tuple(
+                    self._column_nums[index] for index in alias_indices
+                )
+        self._bind_samplers()
+
+    def __getstate__(self) -> dict:
+        # Generated functions cannot be pickled, so every replaced sampling
+        # method is left out and bound again when unpickling. The roll
+        # function is left out too, as a deep copy would share the seeded
+        # generator behind it, and is taken again from the copied generator,
+        # or from the random module's shared state without a seed.
+        state = self.__dict__.copy()
+        for name in (*SAMPLER_NAMES, "_random"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if self._generator is None:
+            self._random = random.random
+        else:
+            self._random = self._generator.random
+        self._bind_samplers()
+
+    def _bind_samplers(self):
+        """
+        Replace the sampling methods with the fastest ones for the numbers and
+        probabilities, using this instance's roll function. Methods that a
+        subclass overrides are left alone.
+        """
+        if self.sampling_method == "search":
+            # With only a few numbers, generated code that searches the ranges
+            # with inlined comparisons takes the fewest interpreted steps.
+            samplers = zip(
+                SAMPLER_NAMES,
+                build_sampling_functions(
+                    self._column_nums, self.probabilities, self._random
+                ),
+            )
+        elif self.sampling_method == "lookup_table":
+            samplers = (
+                ("next_num", self._next_num_from_lookup_table),
+                ("_nums_for_rolls", self._nums_for_rolls_from_lookup_table),
+            )
+        else:
+            samplers = (
+                ("next_num", self._next_num_from_alias_table),
+                ("_nums_for_rolls", self._nums_for_rolls_from_alias_table),
+            )
+
+        for name, sampler in samplers:
+            if getattr(type(self), name) is getattr(RandomGen, name):
+                setattr(self, name, sampler)
+
     def next_num(self) -> int:
         """
         Generate a random number based on the probabilities provided.
@@ -97,25 +464,206 @@ class RandomGen:
             period, it should return the numbers roughly with the initialised
             probabilities.
         """
-        random_roll = random.random()
-        # Find the index of the number whose probability range this random roll
-        # fits into.
-        number_index = find_cumulative_probability_index_of_float(
-            self.cum_probabilities, random_roll
-        )
-        return self.random_nums[number_index]
+        # Each instance replaces this with the fastest way to generate a
+        # number for its probabilities, so this only runs when a subclass
+        # overrides next_num and calls it through super(). Rolling through
+        # _nums_for_rolls keeps the numbers the same as the replacement's.
+        return self._nums_for_rolls((self._random(),))[0]
+
+    def next_nums(self, count: int) -> List[int]:
+        """
+        Generate multiple random numbers based on the probabilities provided.
+
+        The numbers are drawn one after another from the same generator as
+        next_num, so seeding it reproduces the batch.
+
+        Args:
+            count: How many random numbers to generate.
+
+        Returns:
+            A list of random_nums, the same as calling next_num count times.
+        """
+        return self._nums_for_rolls(self._rolls(count))
+
+    def next_sequence(self, seed: int, count: int) -> List[int]:
+        """
+        Generate a reproducible sequence of random numbers for a seed, the same
+        as next_nums on a RandomGen created with that seed.
+
+        The last SEQUENCE_CACHE_SIZE sequences are cached, so asking for the
+        same seed and count again returns a copy of the sequence without
+        generating any numbers. Once the cache is full, the least recently
+        used sequence is dropped to make room, and is generated again if it
+        is asked for later.
+
+        This uses its own generator seeded with the given seed, so it neither
+        depends on nor changes this instance's roll function.
+
+        Args:
+            seed: Integer seed for the sequence.
+            count: How many random numbers to generate.
+
+        Returns:
+            A list of random_nums, which is the same for the same seed and
+            count.
+        """
+        # Only integer seeds are accepted, as other seeds that random.Random
+        # takes either aren't reproducible (None seeds from the system) or
+        # can't be used as a cache key (such as a bytearray).
+        if not isinstance(seed, int):
+            raise TypeError("Seed must be an integer.")
+
+        key = (seed, count)
+        if key in self._sequence_cache:
+            self._sequence_cache.move_to_end(key)
+        else:
+            rolls = itertools.starmap(
+                random.Random(seed).random, itertools.repeat((), count)
+            )
+            self._sequence_cache[key] = self._nums_for_rolls(rolls)
+            if len(self._sequence_cache) > SEQUENCE_CACHE_SIZE:
+                self._sequence_cache.popitem(last=False)
+        return list(self._sequence_cache[key])
+
+    def _nums_for_rolls(self, rolls: Iterable[float]) -> List[int]:
+        """
+        Find the number that each roll generates, as next_num would.
+
+        Args:
+            rolls: Random floats between 0 inclusive and 1 exclusive.
+
+        Returns:
+            A list of random_nums, one for each roll.
+        """
+        # Like next_num, this is replaced on each instance, so it only runs
+        # through super() and must pick the same numbers as the replacement.
+        if self.sampling_method == "alias":
+            return self._nums_for_rolls_from_alias_table(rolls)
+        if self.sampling_method == "lookup_table":
+            return self._nums_for_rolls_from_lookup_table(rolls)
+        # The generated decision tree finds the same range as a binary search.
+        column_nums = self._column_nums
+        float_cum_probabilities = self._float_cum_probabilities
+        return [
+            column_nums[bisect.bisect_right(float_cum_probabilities, roll)]
+            for roll in rolls
+        ]
+
+    def _next_num_from_alias_table(self) -> int:
+        """
+        Generate a random number with the alias method, which replaces
+        next_num when there are too many numbers to search and no small
+        lookup table.
+
+        Returns:
+            One of the random_nums, the same as next_num.
+        """
+        # Pick an index uniformly, then decide whether to keep it or to use its
+        # alias - this takes constant time regardless of the number of numbers.
+        # A single roll is used for both: its integer part picks the index and
+        # its fractional part is uniform within it, which is far cheaper than
+        # calling random.randrange.
+        scaled_roll = self._random() * self._num_count
+        number_index = int(scaled_roll)
+        if scaled_roll - number_index < self._alias_probabilities[number_index]:
+            return self._column_nums[number_index]
+        return self._alias_nums[number_index]
+
+    def _nums_for_rolls_from_alias_table(self, rolls: Iterable[float]) -> List[int]:
+        """
+        Find the number that each roll generates with the alias method, which
+        replaces _nums_for_rolls when next_num uses the alias method.
+
+        Args:
+            rolls: Random floats between 0 inclusive and 1 exclusive.
+
+        Returns:
+            A list of random_nums, one for each roll.
+        """
+        # Inline the alias method from next_num with everything looked up once,
+        # so no method call or attribute access is made per number.
+        column_nums = self._column_nums
+        alias_probabilities = self._alias_probabilities
+        alias_nums = self._alias_nums
+        num_count = self._num_count
+        scaled_rolls = (roll * num_count for roll in rolls)
+        return [
+            (
+                column_nums[number_index]
+                if scaled_roll - (number_index := int(scaled_roll))
+                < alias_probabilities[number_index]
+                else alias_nums[number_index]
+            )
+            for scaled_roll in scaled_rolls
+        ]
+
+    def _rolls(self, count: int) -> Iterator[float]:
+        """
+        Generate rolls for a batch of random numbers.
+
+        Args:
+            count: How many rolls to generate.
+
+        Returns:
+            An iterator of random floats between 0 inclusive and 1 exclusive,
+            which calls the roll function from C rather than from a Python
+            loop.
+        """
+        return itertools.starmap(self._random, itertools.repeat((), count))
+
+    def next_num_fast(self, roll: float) -> int:
+        """
+        Find the number that a roll corresponds to based on the probabilities
+        provided, for callers that generate their own rolls.
+
+        Args:
+            roll: Random float between 0 inclusive and 1 exclusive.
+
+        Returns:
+            The random_num whose cumulative probability range the roll falls
+            into.
+        """
+        return self._column_nums[
+            bisect.bisect_right(self._float_cum_probabilities, roll)
+        ]
+
+    def _next_num_from_lookup_table(self) -> int:
+        """
+        Generate a random number by scaling a roll to an entry of the lookup
+        table, which replaces next_num when every probability is a simple
+        fraction.
+
+        Returns:
+            One of the random_nums, the same as next_num.
+        """
+        return self._lookup_table[int(self._random() * self._lookup_table_size)]
+
+    def _nums_for_rolls_from_lookup_table(self, rolls: Iterable[float]) -> List[int]:
+        """
+        Find the number that each roll generates by scaling it to an entry of
+        the lookup table, which replaces _nums_for_rolls when every
+        probability is a simple fraction.
+
+        Args:
+            rolls: Random floats between 0 inclusive and 1 exclusive.
+
+        Returns:
+            A list of random_nums, one for each roll.
+        """
+        lookup_table = self._lookup_table
+        table_size = self._lookup_table_size
+        return [lookup_table[int(roll * table_size)] for roll in rolls]
 
 
 if __name__ == "__main__":
     input_random_nums = [-1, 0, 1, 2, 3]
     input_probabilities = [0.01, 0.3, 0.58, 0.1, 0.01]
     random_gen = RandomGen(input_random_nums, input_probabilities)
-    num_counts = collections.defaultdict(int)
     # Set how many numbers to generate - a larger number of iterations will
     # converge to the expected probabilities due to the law of large numbers.
     ITERATIONS = 100000
-    for _ in range(ITERATIONS):
-        num_counts[random_gen.next_num()] += 1
+    # Counter tallies the whole batch in C rather than one number at a time.
+    num_counts = collections.Counter(random_gen.next_nums(ITERATIONS))
 
     # Print the parameters and results of the random number generation.
     print(f"Numbers: {input_random_nums}\nProbabilities: {input_probabilities}\n")
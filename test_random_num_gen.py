@@ -1,13 +1,31 @@
 """
 Unit tests for the random_num_gen.py module.
 """
+import collections
+import copy
 import decimal
+import enum
+import pickle
 import random
 
 import pytest
 
 import random_num_gen
 
+# The numbers and probabilities of the generator shared by the tests of the
+# numbers it generates.
+RANDOM_NUMS = [1, 2, 3, 4, 5, 6]
+PROBABILITIES = [0.1, 0.2, 0.3, 0.2, 0.1, 0.1]
+
+
+@pytest.fixture(scope="module")
+def random_gen():
+    """
+    Create the shared generator once, as the tests only generate numbers from
+    it and never change it.
+    """
+    return random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES)
+
 
 def test_input_validation():
     """
@@ -33,6 +51,50 @@ def test_input_validation():
     ]
 
 
+def test_random_nums_are_separate_for_each_generator():
+    """
+    Check that each generator keeps its own random_nums when another one is
+    created.
+    """
+    random_gen = random_num_gen.RandomGen([1, 2], [0.5, 0.5])
+    other_random_gen = random_num_gen.RandomGen([3, 4, 5], [0.2, 0.3, 0.5])
+    assert random_gen.random_nums == [1, 2]
+    assert other_random_gen.random_nums == [3, 4, 5]
+
+
+@pytest.mark.parametrize(
+    "random_nums, probabilities",
+    [
+        ([1, 2, 3], [0.2, 0.3, 0.5]),
+        (list(range(125)), [0.02] * 25 + [0.005] * 100),
+        (list(range(125)), [0.0081] * 100 + [0.0076] * 25),
+    ],
+)
+def test_changing_random_nums_changes_numbers_generated(random_nums, probabilities):
+    """
+    Check that numbers assigned to random_nums after the generator is created
+    are the ones it generates, whichever way the numbers are sampled.
+    """
+    random_gen = random_num_gen.RandomGen(random_nums, probabilities)
+    new_random_nums = [random_num + 1000 for random_num in random_nums]
+    random_gen.random_nums = new_random_nums
+    assert random_gen.random_nums == new_random_nums
+    assert set(random_gen.next_nums(1000)) <= set(new_random_nums)
+    assert random_gen.next_num() in new_random_nums
+
+
+def test_changing_random_nums_to_different_length():
+    """
+    Check that random_nums cannot be changed to a list of a different length
+    from the probabilities, and that the numbers are left unchanged.
+    """
+    random_gen = random_num_gen.RandomGen([1, 2, 3], [0.2, 0.3, 0.5])
+    with pytest.raises(ValueError):
+        random_gen.random_nums = [1, 2]
+    assert random_gen.random_nums == [1, 2, 3]
+    assert set(random_gen.next_nums(100)) <= {1, 2, 3}
+
+
 def test_input_validation_random_nums_not_int():
     """
     Check that random_nums must be a list of integers.
@@ -93,6 +155,25 @@ def test_input_validation_probability_sum_not_one():
         random_num_gen.RandomGen(random_nums, probabilities)
 
 
+def test_random_nums_descriptor_on_class():
+    """
+    Check that accessing random_nums on the class returns the descriptor
+    rather than failing, so the class can be introspected.
+    """
+    assert isinstance(
+        random_num_gen.RandomGen.random_nums, random_num_gen.RandomNumberList
+    )
+
+
+def test_input_validation_empty():
+    """
+    Check that empty inputs are rejected as their probabilities cannot sum
+    to 1.
+    """
+    with pytest.raises(ValueError):
+        random_num_gen.RandomGen([], [])
+
+
 def test_find_index_of_number_for_random_roll_boundaries():
     """
     Check the boundaries for the number indices when finding the index of a
@@ -143,26 +224,136 @@ def test_find_index_of_number_for_random_roll_ranges():
     )
 
 
-def test_returns_values_from_number_list():
+def test_next_num_fast_matches_cumulative_probability_ranges():
     """
-    Check that the number generator only returns integers from the list.
+    Check that the generated function returns the number whose cumulative
+    probability range a roll falls into, including at the boundaries.
+    """
+    rolls = [0.0, 0.005, 0.01, 0.2, 0.31, 0.5, 0.99, 0.9999999999999999]
+    # Check both the generated function and the one used for many numbers.
+    for random_nums, probabilities in (
+        ([-1, 0, 1, 2, 3], [0.01, 0.3, 0.0, 0.68, 0.01]),
+        (list(range(125)), [0.02] * 25 + [0.005] * 100),
+    ):
+        random_gen = random_num_gen.RandomGen(random_nums, probabilities)
+        # Rolls are floats, so their ranges are bounded by float probabilities.
+        cum_probabilities = [float(cum) for cum in random_gen.cum_probabilities]
+        for roll in rolls:
+            expected_index = random_num_gen.find_cumulative_probability_index_of_float(
+                cum_probabilities, roll
+            )
+            assert random_gen.next_num_fast(roll) == random_nums[expected_index]
+
+
+def test_decision_tree_splits_probability_evenly():
+    """
+    Check that the decision tree compares against the threshold that splits
+    the remaining probability most evenly, so likely numbers are found first.
+    """
+    ranges = [
+        (decimal.Decimal("0.6"), 0.6, 0),
+        (decimal.Decimal("0.2"), 0.8, 1),
+        (decimal.Decimal("0.1"), 0.9, 2),
+        (decimal.Decimal("0.1"), 1.0, 3),
+    ]
+    assert random_num_gen.build_decision_tree(ranges) == (
+        "(nums[0] if roll < 0.6 else (nums[1] if roll < 0.8 else "
+        "(nums[2] if roll < 0.9 else nums[3])))"
+    )
+
+
+def test_returns_int_subclass_members():
     """
-    random_nums = [1, 2, 3, 4, 5, 6]
-    probabilities = [0.1, 0.2, 0.3, 0.2, 0.1, 0.1]
+    Check that numbers which are an int subclass, whose repr is not an int
+    literal, are returned as they were given.
+    """
+
+    class Colour(enum.IntEnum):
+        RED = 1
+        GREEN = 2
+
+    random_nums = [Colour.RED, Colour.GREEN]
+    random_gen = random_num_gen.RandomGen(random_nums, [0.5, 0.5], seed=1)
+    assert all(random_num in random_nums for random_num in random_gen.next_nums(100))
+    assert random_gen.next_num_fast(0.25) is Colour.RED
+    assert random_gen.next_num_fast(0.75) is Colour.GREEN
+
+
+def test_alias_table_preserves_probabilities():
+    """
+    Check that the alias table gives each number exactly its probability
+    when the mass across all of the columns is added up.
+    """
+    random_nums = [1, 2, 3, 4]
+    probabilities = [0.1, 0.0, 0.2, 0.7]
     random_gen = random_num_gen.RandomGen(random_nums, probabilities)
+    alias_probabilities, alias_indices = random_num_gen.build_alias_table(
+        random_gen.probabilities
+    )
+    num_count = len(random_nums)
+    masses = [decimal.Decimal(0)] * num_count
+    for index in range(num_count):
+        masses[index] += alias_probabilities[index]
+        masses[alias_indices[index]] += 1 - alias_probabilities[index]
+    assert [mass / num_count for mass in masses] == random_gen.probabilities
+
+
+def test_returns_values_from_number_list(random_gen):
+    """
+    Check that the number generator only returns integers from the list.
+    """
     iterations = 1000
+    # Seed the random number generator so that the test is deterministic.
+    random.seed(1234)
+    valid_nums = set(RANDOM_NUMS)
+    assert set(random_gen.next_nums(iterations)) <= valid_nums
     for _ in range(iterations):
-        assert random_gen.next_num() in random_nums
+        assert random_gen.next_num() in valid_nums
+
+
+@pytest.mark.parametrize(
+    "random_nums, probabilities, sampling_method",
+    [
+        (RANDOM_NUMS, PROBABILITIES, "search"),
+        (list(range(125)), [0.0081] * 100 + [0.0076] * 25, "alias"),
+        (list(range(125)), [0.02] * 25 + [0.005] * 100, "lookup_table"),
+        (list(range(100)), [0.01] * 100, "lookup_table"),
+    ],
+)
+def test_next_nums_matches_next_num(random_nums, probabilities, sampling_method):
+    """
+    Check that generating numbers in a batch returns the same sequence as
+    generating them one at a time with the same seed, for each way that the
+    numbers can be sampled.
+    """
+    random_gen = random_num_gen.RandomGen(random_nums, probabilities)
+    assert random_gen.sampling_method == sampling_method
+    iterations = 1000
+
+    random.seed(10)
+    expected_res = [random_gen.next_num() for _ in range(iterations)]
+    assert set(expected_res) <= set(random_nums)
+    random.seed(10)
+    assert random_gen.next_nums(iterations) == expected_res
+
+
+def test_lookup_table_preserves_probabilities():
+    """
+    Check that each number fills the share of the lookup table given by its
+    probability, and that no table is built if it would be too large.
+    """
+    probabilities = [decimal.Decimal(p) for p in ("0.25", "0.5", "0.25")]
+    lookup_table = random_num_gen.build_lookup_table([1, 2, 3], probabilities, 4)
+    assert lookup_table == [1, 2, 2, 3]
+    probabilities = [decimal.Decimal(p) for p in ("0.125", "0.875")]
+    assert random_num_gen.build_lookup_table([1, 2], probabilities, 4) is None
 
 
-def test_returns_same_results_for_same_seed():
+def test_returns_same_results_for_same_seed(random_gen):
     """
     Check that the number generator returns the same sequence of numbers
     when the seed is the same, as the random function is pseudorandom.
     """
-    random_nums = [1, 2, 3, 4, 5, 6]
-    probabilities = [0.1, 0.2, 0.3, 0.2, 0.1, 0.1]
-    random_gen = random_num_gen.RandomGen(random_nums, probabilities)
     iterations = 1000
 
     # Seed the random number generator and get the expected results to
@@ -178,14 +369,143 @@ def test_returns_same_results_for_same_seed():
         assert [random_gen.next_num() for _ in range(iterations)] == expected_res
 
 
-def test_returns_different_results_for_different_seeds():
+def test_returns_same_results_for_same_instance_seed():
+    """
+    Check that number generators given the same seed return the same
+    sequence of numbers, regardless of the random module's shared state.
+    """
+    iterations = 1000
+    random_gen = random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES, seed=10)
+    other_random_gen = random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES, seed=10)
+
+    random.seed(1)
+    expected_res = [random_gen.next_num() for _ in range(iterations)]
+    random.seed(2)
+    assert other_random_gen.next_nums(iterations) == expected_res
+
+
+def test_subclass_can_override_next_num():
+    """
+    Check that a subclass's next_num is used rather than the one generated
+    for the probabilities, and that it can call the original through super().
+    """
+
+    class TenfoldRandomGen(random_num_gen.RandomGen):
+        def next_num(self):
+            return super().next_num() * 10
+
+    random_gen = TenfoldRandomGen(RANDOM_NUMS, PROBABILITIES, seed=10)
+    assert {random_gen.next_num() for _ in range(100)} <= {
+        random_num * 10 for random_num in RANDOM_NUMS
+    }
+
+
+@pytest.mark.parametrize(
+    "random_nums, probabilities",
+    [
+        (RANDOM_NUMS, PROBABILITIES),
+        (list(range(125)), [0.02] * 25 + [0.005] * 100),
+        (list(range(125)), [0.0081] * 100 + [0.0076] * 25),
+    ],
+)
+def test_class_next_num_matches_instance_next_num(random_nums, probabilities):
+    """
+    Check that calling next_num through the class, as super() does, generates
+    the same numbers as the instance's own next_num, whichever way the
+    numbers are sampled.
+    """
+    iterations = 100
+    random_gen = random_num_gen.RandomGen(random_nums, probabilities, seed=10)
+    expected_res = [random_gen.next_num() for _ in range(iterations)]
+    random_gen = random_num_gen.RandomGen(random_nums, probabilities, seed=10)
+    assert [
+        random_num_gen.RandomGen.next_num(random_gen) for _ in range(iterations)
+    ] == expected_res
+
+
+def test_pickled_generator_returns_same_results():
+    """
+    Check that a generator with generated sampling functions can be pickled,
+    and that the copy continues from the same seeded state.
+    """
+    random_gen = random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES, seed=10)
+    random_gen.next_nums(5)
+    unpickled_gen = pickle.loads(pickle.dumps(random_gen))
+    assert unpickled_gen.next_nums(100) == random_gen.next_nums(100)
+
+
+def test_deep_copied_generator_is_independent():
+    """
+    Check that a deep copy of a seeded generator draws from its own copy of
+    the seeded state, rather than sharing the original's.
+    """
+    random_gen = random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES, seed=10)
+    copied_gen = copy.deepcopy(random_gen)
+    assert copied_gen.next_nums(100) == random_gen.next_nums(100)
+
+
+def test_next_sequence_is_same_for_same_seed(random_gen):
+    """
+    Check that the number generator returns the same sequence for the same
+    seed and count, and a different one for a different seed.
+    """
+    iterations = 1000
+
+    expected_res = random_gen.next_sequence(10, iterations)
+    assert len(expected_res) == iterations
+    assert set(expected_res) <= set(RANDOM_NUMS)
+    # Check that changing the returned list does not change the cached one.
+    expected_res.append(0)
+    assert random_gen.next_sequence(10, iterations) == expected_res[:-1]
+    assert random_gen.next_sequence(11, iterations) != expected_res[:-1]
+
+
+def test_next_sequence_matches_seeded_next_nums():
+    """
+    Check that a sequence for a seed is the same as the batch generated by a
+    generator created with that seed, whichever way the numbers are sampled.
+    """
+    iterations = 1000
+    for random_nums, probabilities in (
+        (RANDOM_NUMS, PROBABILITIES),
+        (list(range(125)), [0.02] * 25 + [0.005] * 100),
+        (list(range(125)), [0.0081] * 100 + [0.0076] * 25),
+    ):
+        random_gen = random_num_gen.RandomGen(random_nums, probabilities)
+        seeded_gen = random_num_gen.RandomGen(random_nums, probabilities, seed=10)
+        expected_res = seeded_gen.next_nums(iterations)
+        assert random_gen.next_sequence(10, iterations) == expected_res
+
+
+@pytest.mark.parametrize("seed", [None, 1.5, "seed", bytearray(b"seed")])
+def test_next_sequence_rejects_non_int_seed(random_gen, seed):
+    """
+    Check that a sequence can only be generated for an integer seed, as it
+    would not be reproducible or could not be cached otherwise.
+    """
+    with pytest.raises(TypeError):
+        random_gen.next_sequence(seed, 10)
+
+
+def test_next_sequence_cache_is_bounded():
+    """
+    Check that only the most recently used sequences are kept, and that a
+    dropped sequence is generated again the same when it is asked for.
+    """
+    random_gen = random_num_gen.RandomGen(RANDOM_NUMS, PROBABILITIES)
+    expected_res = random_gen.next_sequence(0, 10)
+    for seed in range(1, random_num_gen.SEQUENCE_CACHE_SIZE + 1):
+        random_gen.next_sequence(seed, 10)
+    assert len(random_gen._sequence_cache) == random_num_gen.SEQUENCE_CACHE_SIZE
+    assert (0, 10) not in random_gen._sequence_cache
+    assert random_gen.next_sequence(0, 10) == expected_res
+
+
+def test_returns_different_results_for_different_seeds(random_gen):
     """
     Check that the number generator returns different sequences of numbers
     when the seed is different, as the random function is pseudorandom.
     """
-    random_nums = [1, 2, 3, 4, 5, 6]
-    probabilities = [0.1, 0.2, 0.3, 0.2, 0.1, 0.1]
-    random_gen = random_num_gen.RandomGen(random_nums, probabilities)
     iterations = 1000
 
     # Seed the random number generator and get the expected results to
@@ -201,36 +521,27 @@ def test_returns_different_results_for_different_seeds():
         assert [random_gen.next_num() for _ in range(iterations)] != expected_res
 
 
-def test_monte_carlo_simulation():
+def test_monte_carlo_simulation(random_gen):
     """
     Check that the number generator returns numbers with frequencies that
     are within an expected range given the probabilities.
     """
-    random_nums = [1, 2, 3, 4, 5, 6]
-    probabilities = [0.1, 0.2, 0.3, 0.2, 0.1, 0.1]
-    random_gen = random_num_gen.RandomGen(random_nums, probabilities)
     iterations = 100000
     samples = 100
 
     # Get the expected frequencies of the numbers given the probabilities.
-    expected_frequencies = [prob * iterations for prob in probabilities]
+    expected_frequencies = [prob * iterations for prob in PROBABILITIES]
 
     for _ in range(samples):
         random.seed()
         # Get the actual frequencies of the numbers returned by the number
-        # generator.
-        actual_frequencies = [0] * len(random_nums)
-        for _ in range(iterations):
-            actual_frequencies[random_gen.next_num() - 1] += 1
+        # generator, generating and counting them all in one batch.
+        num_counts = collections.Counter(random_gen.next_nums(iterations))
+        actual_frequencies = [num_counts[random_num] for random_num in RANDOM_NUMS]
 
         # Check that the actual frequencies are within 5% of the expected
         # range given the probabilities.
-        for index in range(len(random_nums)):
-            assert (
-                abs(actual_frequencies[index] - expected_frequencies[index])
-                / expected_frequencies[index]
-                <= 0.05
-            )
+        assert actual_frequencies == pytest.approx(expected_frequencies, rel=0.05)
 
 
 if __name__ == "__main__":